@@ -1,86 +1,328 @@
+import atexit
+import functools
+import gzip
+import hashlib
 import os
 import json
-from datetime import datetime
-from flask import Flask, request, jsonify, send_file, render_template
+import re
+import time
+import weakref
+from contextlib import contextmanager
+from flask import Flask, after_this_request, request, jsonify, send_file, Response
 from flask_cors import CORS
+import orjson
 import psycopg2
-from psycopg2.extras import RealDictCursor
-import io
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor, execute_values
+import redis
+import tempfile
 import xlsxwriter
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
-CORS(app)
+# Only the API needs CORS; max_age lets browsers cache the preflight for
+# a day so OPTIONS traffic mostly disappears. Origins can be narrowed
+# with a comma-separated CORS_ORIGINS.
+CORS(app,
+     resources={r"/api/*": {"origins": os.environ.get('CORS_ORIGINS', '*').split(',')}},
+     max_age=86400)
+
+# orjson serializes to bytes several times faster than the stdlib json
+# used by jsonify; used on the payload-heavy endpoints
+def json_response(obj, status=200):
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Static assets can be cached for a year; cache busting happens by
+# changing the URL, the HTML shell keeps its own short max-age
+@app.after_request
+def add_static_cache_headers(resp):
+    if request.path.startswith('/static/'):
+        resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return resp
+
+# Conditional GET support: tag the body, answer If-None-Match with an
+# empty 304 so unchanged payloads cost a few hundred bytes on the wire
+def conditional_json_response(body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    elif len(body) >= 500 and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        # Repetitive JSON (repeated keys and group names) compresses 5-8x;
+        # level 6 keeps the per-request CPU cost small
+        resp = Response(gzip.compress(body, 6), mimetype='application/json')
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return resp
+
+# Response cache for the hot GET endpoints; optional so local dev works
+# without a Redis instance
+cache = redis.Redis.from_url(os.environ['REDIS_URL']) if os.environ.get('REDIS_URL') else None
+
+def cache_get(key):
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except redis.RedisError:
+        return None
+
+def cache_set(key, body, ttl=3600):
+    if cache is None:
+        return
+    try:
+        cache.setex(key, ttl, body)
+    except redis.RedisError:
+        pass
+
+def cache_invalidate(*keys):
+    if cache is None:
+        return
+    try:
+        cache.delete(*keys)
+    except redis.RedisError:
+        pass
+
+# Connection pool (opening a fresh connection per request costs a full
+# TCP + auth round-trip; handing out pooled connections is near-free)
+pool = psycopg2.pool.ThreadedConnectionPool(
+    minconn=4, maxconn=32,
+    dsn=os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
+atexit.register(pool.closeall)
 
 # Database connection
+@contextmanager
 def get_db_connection():
-    conn = psycopg2.connect(os.environ['DATABASE_URL'], cursor_factory=RealDictCursor)
-    return conn
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+# Hot statements are PREPAREd once per pooled connection so Postgres
+# skips the parse/plan step on every later call; values are
+# (argument types, statement body)
+PREPARED_STATEMENTS = {
+    'sel_ingredients_db': ('', "SELECT name, hydration FROM ingredients_db"),
+    'del_recipe_by_title': ('(text)', "DELETE FROM recipes_v2 WHERE title = $1"),
+    'sel_conversion': ('(text, text[], bool, float8)', """
+        WITH flour AS (
+            SELECT COALESCE(SUM(i.weight), 0) AS total
+            FROM recipes_v2 r JOIN recipe_ingredients i ON i.recipe_id = r.id
+            WHERE r.title = $1 AND i.group_name = ANY($2) AND i.is_flour
+        )
+        SELECT r.steps, r.top_heat, r.bottom_heat, r.bake_time, r.convection, r.steam,
+               i.id AS ing_id, i.group_name, i.ingredient, COALESCE(i.weight, 0) AS weight,
+               CASE WHEN i.percent IS NOT NULL
+                    THEN to_char(i.percent * 100, 'FM999999990.00') || '%'
+                    ELSE '' END AS percent_display,
+               i.description, flour.total AS original_total_flour,
+               CASE WHEN flour.total > 0 AND (i.group_name = ANY($2) OR $3)
+                    THEN ROUND((COALESCE(i.weight, 0) * $4 / flour.total)::numeric, 1)::float
+                    ELSE COALESCE(i.weight, 0) END AS converted_weight
+        FROM recipes_v2 r
+        LEFT JOIN recipe_ingredients i ON i.recipe_id = r.id
+        CROSS JOIN flour
+        WHERE r.title = $1
+        ORDER BY i.id
+    """),
+}
+_prepared_by_conn = weakref.WeakKeyDictionary()
+
+def prepared_execute(conn, cur, name, params=None):
+    prepared = _prepared_by_conn.setdefault(conn, set())
+    if name not in prepared:
+        argtypes, statement = PREPARED_STATEMENTS[name]
+        cur.execute(f"PREPARE {name} {argtypes} AS {statement}")
+        prepared.add(name)
+    if params:
+        placeholders = ', '.join(['%s'] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
 
 # Initialize database tables
 def init_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS recipes_v2 (
+                id SERIAL PRIMARY KEY,
+                title TEXT NOT NULL UNIQUE,
+                steps TEXT,
+                timestamp TIMESTAMPTZ DEFAULT now(),
+                top_heat INTEGER DEFAULT 200,
+                bottom_heat INTEGER DEFAULT 200,
+                bake_time INTEGER DEFAULT 30,
+                convection BOOLEAN DEFAULT FALSE,
+                steam BOOLEAN DEFAULT FALSE
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                id SERIAL PRIMARY KEY,
+                recipe_id INTEGER NOT NULL REFERENCES recipes_v2(id) ON DELETE CASCADE,
+                group_name TEXT,
+                ingredient TEXT,
+                weight FLOAT,
+                percent FLOAT,
+                description TEXT,
+                is_flour BOOLEAN GENERATED ALWAYS AS
+                    (ingredient LIKE '%麵粉%' OR ingredient LIKE '%裸麥粉%') STORED
+            )
+        """)
+        # Same classification for databases created before the column existed
+        cur.execute("""
+            ALTER TABLE recipe_ingredients ADD COLUMN IF NOT EXISTS is_flour BOOLEAN
+                GENERATED ALWAYS AS
+                    (ingredient LIKE '%麵粉%' OR ingredient LIKE '%裸麥粉%') STORED
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingredients_db (
+                name TEXT PRIMARY KEY,
+                hydration FLOAT
+            )
+        """)
+        # Databases created before the column carried a timezone: rewrite it
+        # once (naive values were local server time, i.e. UTC on Render)
+        cur.execute("""
+            DO $$ BEGIN
+                IF EXISTS (SELECT 1 FROM information_schema.columns
+                           WHERE table_name = 'recipes_v2' AND column_name = 'timestamp'
+                             AND data_type = 'timestamp without time zone') THEN
+                    ALTER TABLE recipes_v2 ALTER COLUMN timestamp
+                        TYPE TIMESTAMPTZ USING timestamp AT TIME ZONE 'UTC';
+                    ALTER TABLE recipes_v2 ALTER COLUMN timestamp SET DEFAULT now();
+                END IF;
+            END $$
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_v2_timestamp ON recipes_v2 (timestamp DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe_id ON recipe_ingredients (recipe_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_flour ON recipe_ingredients (recipe_id) WHERE is_flour")
+        migrate_legacy_recipes(cur)
+        conn.commit()
+        cur.close()
+
+# One-time migration from the old flat recipes table, where every ingredient
+# row duplicated title/steps/timestamp/baking columns
+def migrate_legacy_recipes(cur):
+    cur.execute("SELECT to_regclass('recipes')")
+    if cur.fetchone()['to_regclass'] is None:
+        return
+    cur.execute("SELECT COUNT(*) AS n FROM recipes_v2")
+    if cur.fetchone()['n'] > 0:
+        return
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS recipes (
-            id SERIAL PRIMARY KEY,
-            title TEXT NOT NULL,
-            group_name TEXT,
-            ingredient TEXT,
-            weight FLOAT,
-            percent FLOAT,
-            description TEXT,
-            steps TEXT,
-            timestamp TIMESTAMP,
-            top_heat INTEGER,
-            bottom_heat INTEGER,
-            bake_time INTEGER,
-            convection BOOLEAN,
-            steam BOOLEAN
-        )
+        INSERT INTO recipes_v2 (title, steps, timestamp, top_heat, bottom_heat, bake_time, convection, steam)
+        SELECT DISTINCT ON (title) title, steps, timestamp,
+               COALESCE(top_heat, 200), COALESCE(bottom_heat, 200), COALESCE(bake_time, 30),
+               COALESCE(convection, FALSE), COALESCE(steam, FALSE)
+        FROM recipes ORDER BY title, timestamp DESC
     """)
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS ingredients_db (
-            name TEXT PRIMARY KEY,
-            hydration FLOAT
-        )
+        INSERT INTO recipe_ingredients (recipe_id, group_name, ingredient, weight, percent, description)
+        SELECT r.id, o.group_name, o.ingredient, o.weight, o.percent, o.description
+        FROM recipes o JOIN recipes_v2 r ON r.title = o.title
+        ORDER BY o.id
     """)
-    conn.commit()
-    cur.close()
-    conn.close()
 
-init_db()
+# Run DDL once at release time with `flask init-db` and set SKIP_DB_INIT=1
+# so every gunicorn worker doesn't re-issue the CREATE/ALTER round trips
+# at boot; without the flag each worker still self-initializes
+@app.cli.command('init-db')
+def init_db_command():
+    init_db()
+
+if os.environ.get('SKIP_DB_INIT') != '1':
+    init_db()
 
 # Normalize percent value
+_PCT_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*(%?)\s*$')
+
 def normalize_percent_value(p):
     if p is None or p == "":
         return None
-    if isinstance(p, str):
-        s = p.strip()
-        if s.endswith('%'):
-            try:
-                n = float(s.replace('%', '').strip())
-                return n / 100
-            except ValueError:
-                return None
-        try:
-            n = float(s)
-            return n / 100 if n > 1 else n
-        except ValueError:
-            return None
     if isinstance(p, (int, float)):
         return p / 100 if p > 1 else p
-    return None
+    if not isinstance(p, str):
+        return None
+    m = _PCT_RE.match(p)
+    if not m:
+        return None
+    n = float(m.group(1))
+    return n / 100 if (m.group(2) or n > 1) else n
+
+# Upsert one recipe row plus its ingredient rows; returns the recipe id.
+# Postgres stamps the row itself (DEFAULT now() / now() on update)
+def upsert_recipe(cur, title, ingredients, steps, baking_info):
+    cur.execute("""
+        INSERT INTO recipes_v2 (title, steps, top_heat, bottom_heat, bake_time, convection, steam)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (title) DO UPDATE SET
+            steps = EXCLUDED.steps, timestamp = now(),
+            top_heat = EXCLUDED.top_heat, bottom_heat = EXCLUDED.bottom_heat,
+            bake_time = EXCLUDED.bake_time, convection = EXCLUDED.convection, steam = EXCLUDED.steam
+        RETURNING id
+    """, (title, steps,
+          baking_info['topHeat'], baking_info['bottomHeat'], baking_info['time'],
+          baking_info['convection'], baking_info['steam']))
+    recipe_id = cur.fetchone()['id']
+    replace_ingredients(cur, recipe_id, ingredients)
+    return recipe_id
+
+# Rewrite a recipe's ingredient rows, skipping the delete+insert cycle
+# (and its WAL/index churn) when nothing actually changed
+def replace_ingredients(cur, recipe_id, ingredients):
+    rows = [(ing['group'], ing['name'], ing['weight'],
+             normalize_percent_value(ing['percent']), ing['desc']) for ing in ingredients]
+    cur.execute("""
+        SELECT group_name, ingredient, weight, percent, description
+        FROM recipe_ingredients WHERE recipe_id = %s ORDER BY id
+    """, (recipe_id,))
+    existing = [(r['group_name'], r['ingredient'], r['weight'], r['percent'], r['description'])
+                for r in cur.fetchall()]
+    if existing == rows:
+        return
+    cur.execute("DELETE FROM recipe_ingredients WHERE recipe_id = %s", (recipe_id,))
+    execute_values(cur, """
+        INSERT INTO recipe_ingredients (recipe_id, group_name, ingredient, weight, percent, description)
+        VALUES %s
+    """, [(recipe_id,) + row for row in rows], page_size=100)
+
+# Tiny in-process layer in front of Redis for the ingredient lookups the
+# UI fires on every keystroke; worst-case staleness across gunicorn
+# workers is bounded by the TTL
+_ING_CACHE_TTL = 60
+_ing_cache = {'body': None, 'expires': 0.0}
 
 # Get ingredients DB
 @app.route('/api/ingredients_db', methods=['GET'])
 def get_ingredients_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM ingredients_db")
-    data = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify(data)
+    if _ing_cache['body'] is not None and time.monotonic() < _ing_cache['expires']:
+        return conditional_json_response(_ing_cache['body'])
+    cached = cache_get('ingredients_db')
+    if cached is not None:
+        body = cached
+    else:
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            prepared_execute(conn, cur, 'sel_ingredients_db')
+            data = cur.fetchall()
+            cur.close()
+        body = orjson.dumps(data)
+        cache_set('ingredients_db', body)
+    _ing_cache['body'] = body
+    _ing_cache['expires'] = time.monotonic() + _ING_CACHE_TTL
+    return conditional_json_response(body)
 
 # Save ingredient DB
 @app.route('/api/save_ingredient_db', methods=['POST'])
@@ -88,29 +330,35 @@ def save_ingredient_db():
     ingredient = request.json
     name = ingredient['name']
     hydration = ingredient['hydration']
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO ingredients_db (name, hydration) VALUES (%s, %s)
-        ON CONFLICT (name) DO UPDATE SET hydration = %s
-    """, (name, hydration, hydration))
-    conn.commit()
-    cur.close()
-    conn.close()
-    return jsonify({"status": "success", "message": f"已更新食材：{name}" if 'updated' else f"已新增食材：{name}"})
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        # xmax = 0 only on freshly inserted tuples, so one round trip tells
+        # apart insert and update (the old check compared a literal string)
+        cur.execute("""
+            INSERT INTO ingredients_db (name, hydration) VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE SET hydration = EXCLUDED.hydration
+            RETURNING (xmax = 0) AS inserted
+        """, (name, hydration))
+        inserted = cur.fetchone()['inserted']
+        conn.commit()
+        cur.close()
+    cache_invalidate('ingredients_db')
+    _ing_cache['expires'] = 0.0
+    return jsonify({"status": "success", "message": f"已新增食材：{name}" if inserted else f"已更新食材：{name}"})
 
 # Delete ingredient DB
 @app.route('/api/delete_ingredient_db', methods=['DELETE'])
 def delete_ingredient_db():
     name = request.args.get('name')
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM ingredients_db WHERE name = %s", (name,))
-    conn.commit()
-    if cur.rowcount == 0:
-        return jsonify({"status": "error", "message": f"找不到食材：{name}"}), 404
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM ingredients_db WHERE name = %s", (name,))
+        conn.commit()
+        if cur.rowcount == 0:
+            return jsonify({"status": "error", "message": f"找不到食材：{name}"}), 404
+        cur.close()
+    cache_invalidate('ingredients_db')
+    _ing_cache['expires'] = 0.0
     return jsonify({"status": "success", "message": f"已刪除食材：{name}"})
 
 # Save recipe
@@ -121,75 +369,107 @@ def save_recipe():
     ingredients = data['ingredients']
     steps = data['steps']
     baking_info = data['bakingInfo']
-    timestamp = datetime.now()
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    for ing in ingredients:
-        percent_norm = normalize_percent_value(ing['percent'])
-        cur.execute("""
-            INSERT INTO recipes (title, group_name, ingredient, weight, percent, description, steps, timestamp,
-                                 top_heat, bottom_heat, bake_time, convection, steam)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (title, ing['group'], ing['name'], ing['weight'], percent_norm, ing['desc'], steps, timestamp,
-              baking_info['topHeat'], baking_info['bottomHeat'], baking_info['time'],
-              baking_info['convection'], baking_info['steam']))
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        upsert_recipe(cur, title, ingredients, steps, baking_info)
+        conn.commit()
+        cur.close()
+    cache_invalidate('recipes', 'search_index')
+    compute_conversion.cache_clear()
     return jsonify({"status": "success"})
 
+# Bulk import (e.g. re-importing an Excel export); all recipes land in
+# one transaction with batched ingredient inserts
+@app.route('/api/import_recipes', methods=['POST'])
+def import_recipes():
+    recipes = request.json['recipes']
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        for recipe in recipes:
+            upsert_recipe(cur, recipe['title'], recipe['ingredients'], recipe['steps'],
+                          recipe['bakingInfo'])
+        conn.commit()
+        cur.close()
+    cache_invalidate('recipes', 'search_index')
+    compute_conversion.cache_clear()
+    return jsonify({"status": "success", "message": f"已匯入 {len(recipes)} 份食譜"})
+
 # Get recipes
 @app.route('/api/recipes', methods=['GET'])
 def get_recipes():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM recipes ORDER BY timestamp DESC")
-    data = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    recipes = {}
-    for row in data:
-        title = row['title']
-        if title not in recipes:
-            recipes[title] = {
-                "title": title,
-                "ingredients": [],
-                "steps": row['steps'],
-                "timestamp": row['timestamp'].isoformat() if row['timestamp'] else "",
-                "baking": {
-                    "topHeat": row['top_heat'] or 200,
-                    "bottomHeat": row['bottom_heat'] or 200,
-                    "time": row['bake_time'] or 30,
-                    "convection": row['convection'],
-                    "steam": row['steam']
-                }
-            }
-        percent_display = ""
-        if row['percent'] is not None:
-            percent_display = f"{row['percent'] * 100:.2f}%"
-        recipes[title]['ingredients'].append({
-            "group": row['group_name'] or "",
-            "name": row['ingredient'] or "",
-            "weight": row['weight'] or 0,
-            "percent": percent_display,
-            "desc": row['description'] or ""
-        })
-    return jsonify(list(recipes.values()))
+    cached = cache_get('recipes')
+    if cached is not None:
+        return conditional_json_response(cached)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        # Postgres assembles the response JSON; Python does no per-row work
+        cur.execute("""
+            SELECT COALESCE(jsonb_agg(recipe ORDER BY ts DESC NULLS LAST)::text, '[]') AS body
+            FROM (
+                SELECT r.timestamp AS ts, jsonb_build_object(
+                    'id', r.id,
+                    'title', r.title,
+                    'steps', r.steps,
+                    'timestamp', COALESCE(to_char(r.timestamp, 'YYYY-MM-DD"T"HH24:MI:SS'), ''),
+                    'baking', jsonb_build_object(
+                        'topHeat', r.top_heat, 'bottomHeat', r.bottom_heat, 'time', r.bake_time,
+                        'convection', r.convection, 'steam', r.steam),
+                    'ingredients', COALESCE(jsonb_agg(jsonb_build_object(
+                        'group', COALESCE(i.group_name, ''),
+                        'name', COALESCE(i.ingredient, ''),
+                        'weight', COALESCE(i.weight, 0),
+                        'percent', CASE WHEN i.percent IS NOT NULL
+                                        THEN to_char(i.percent * 100, 'FM999999990.00') || '%'
+                                        ELSE '' END,
+                        'desc', COALESCE(i.description, '')
+                    ) ORDER BY i.id) FILTER (WHERE i.id IS NOT NULL), '[]'::jsonb)
+                ) AS recipe
+                FROM recipes_v2 r LEFT JOIN recipe_ingredients i ON i.recipe_id = r.id
+                GROUP BY r.id
+            ) grouped
+        """)
+        body = cur.fetchone()['body']
+        cur.close()
+    cache_set('recipes', body)
+    return conditional_json_response(body)
+
+# Search index: ingredient name -> recipe titles, precomputed in SQL so
+# the client worker can answer exact-name queries with one dict lookup
+@app.route('/api/search_index', methods=['GET'])
+def get_search_index():
+    cached = cache_get('search_index')
+    if cached is not None:
+        return conditional_json_response(cached)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COALESCE(jsonb_object_agg(token, titles)::text, '{}') AS body
+            FROM (
+                SELECT i.ingredient AS token, jsonb_agg(DISTINCT r.title) AS titles
+                FROM recipes_v2 r JOIN recipe_ingredients i ON i.recipe_id = r.id
+                WHERE i.ingredient IS NOT NULL AND i.ingredient <> ''
+                GROUP BY i.ingredient
+            ) tokens
+        """)
+        body = cur.fetchone()['body']
+        cur.close()
+    cache_set('search_index', body)
+    return conditional_json_response(body)
 
 # Delete recipe
 @app.route('/api/delete_recipe', methods=['DELETE'])
 def delete_recipe():
     title = request.args.get('title')
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM recipes WHERE title = %s", (title,))
-    deleted_count = cur.rowcount
-    conn.commit()
-    cur.close()
-    conn.close()
-    return jsonify({"status": "success", "message": f"已刪除食譜：{title} ({deleted_count} 行數據)"})
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        prepared_execute(conn, cur, 'del_recipe_by_title', (title,))
+        deleted_count = cur.rowcount
+        conn.commit()
+        cur.close()
+    cache_invalidate('recipes', 'search_index')
+    compute_conversion.cache_clear()
+    return jsonify({"status": "success", "message": f"已刪除食譜：{title} ({deleted_count} 筆)"})
 
 # Update recipe
 @app.route('/api/update_recipe', methods=['POST'])
@@ -200,65 +480,130 @@ def update_recipe():
     ingredients = data['ingredients']
     steps = data['steps']
     baking_info = data['bakingInfo']
-    timestamp = datetime.now()
-
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM recipes WHERE title = %s", (old_title,))
-    deleted_count = cur.rowcount
-    for ing in ingredients:
-        percent_norm = normalize_percent_value(ing['percent'])
-        cur.execute("""
-            INSERT INTO recipes (title, group_name, ingredient, weight, percent, description, steps, timestamp,
-                                 top_heat, bottom_heat, bake_time, convection, steam)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (new_title, ing['group'], ing['name'], ing['weight'], percent_norm, ing['desc'], steps, timestamp,
-              baking_info['topHeat'], baking_info['bottomHeat'], baking_info['time'],
-              baking_info['convection'], baking_info['steam']))
-    conn.commit()
-    cur.close()
-    conn.close()
-    return jsonify({"status": "success", "message": f"已更新食譜：{old_title} → {new_title} (刪除 {deleted_count} 行，新增 {len(ingredients)} 行)"})
+
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        recipe_id = data.get('recipeId')
+        if recipe_id is None:
+            cur.execute("SELECT id FROM recipes_v2 WHERE title = %s", (old_title,))
+            row = cur.fetchone()
+            recipe_id = row['id'] if row else None
+        try:
+            if recipe_id is not None:
+                # The id is stable, so a rename is a single-row UPDATE instead
+                # of delete-everything + reinsert-everything
+                cur.execute("""
+                    UPDATE recipes_v2 SET title = %s, steps = %s, timestamp = now(),
+                           top_heat = %s, bottom_heat = %s, bake_time = %s, convection = %s, steam = %s
+                    WHERE id = %s
+                """, (new_title, steps,
+                      baking_info['topHeat'], baking_info['bottomHeat'], baking_info['time'],
+                      baking_info['convection'], baking_info['steam'], recipe_id))
+                if cur.rowcount:
+                    replace_ingredients(cur, recipe_id, ingredients)
+                else:
+                    # The id went stale (recipe deleted elsewhere); recreate
+                    # under the new title instead of inserting dangling rows
+                    upsert_recipe(cur, new_title, ingredients, steps, baking_info)
+            else:
+                upsert_recipe(cur, new_title, ingredients, steps, baking_info)
+            conn.commit()
+        except psycopg2.errors.UniqueViolation:
+            # Renaming onto a title another recipe already holds
+            conn.rollback()
+            cur.close()
+            return jsonify({"status": "error", "message": f"食譜名稱已存在：{new_title}"}), 409
+        cur.close()
+    cache_invalidate('recipes', 'search_index')
+    compute_conversion.cache_clear()
+    return jsonify({"status": "success", "message": f"已更新食譜：{old_title} → {new_title} ({len(ingredients)} 項食材)"})
+
+# Health check; the DB probe result is cached briefly so load-balancer
+# polling can't eat pool connections
+_HEALTH_TTL = 2
+_health = {'checked': 0.0, 'ok': True}
+
+@app.route('/health')
+def health_check():
+    now = time.monotonic()
+    if now - _health['checked'] >= _HEALTH_TTL:
+        try:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+            _health['ok'] = True
+        except psycopg2.Error:
+            _health['ok'] = False
+        _health['checked'] = now
+    if _health['ok']:
+        return jsonify({"status": "ok"})
+    return jsonify({"status": "error"}), 503
 
 # Diagnose data structure (for debugging)
 @app.route('/api/diagnose', methods=['GET'])
 def diagnose_data_structure():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM recipes LIMIT 5")
-    data = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify(data)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT r.id, r.title, r.steps, r.timestamp, r.top_heat, r.bottom_heat,
+                   r.bake_time, r.convection, r.steam,
+                   i.group_name, i.ingredient, i.weight, i.percent, i.description
+            FROM recipes_v2 r LEFT JOIN recipe_ingredients i ON i.recipe_id = r.id
+            LIMIT 5
+        """)
+        data = cur.fetchall()
+        cur.close()
+    return json_response(data)
 
 # Clear all data (caution)
 @app.route('/api/clear_all', methods=['DELETE'])
 def clear_all_data():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM recipes")
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM recipes_v2")
+        conn.commit()
+        cur.close()
+    cache_invalidate('recipes', 'search_index')
+    compute_conversion.cache_clear()
     return jsonify({"message": "已清除所有數據"})
 
 # Calculate recipe conversion
+_CONVERSION_CACHE_TTL = 60
+
 @app.route('/api/calculate_conversion', methods=['POST'])
 def calculate_recipe_conversion():
     data = request.json
-    recipe_title = data['recipeTitle']
-    new_total_flour = data['newTotalFlour']
-    include_non_percentage_groups = data['includeNonPercentageGroups']
-
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM recipes WHERE title = %s", (recipe_title,))
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    payload, status = compute_conversion(data['recipeTitle'], float(data['newTotalFlour']),
+                                         bool(data['includeNonPercentageGroups']),
+                                         int(time.monotonic() // _CONVERSION_CACHE_TTL))
+    return json_response(payload, status)
+
+# The UI mostly requests the same 7 preset ratios for a recipe, so the pure
+# computation is memoized. Write endpoints cache_clear() the handling
+# worker immediately; the time-bucket argument expires entries in the
+# other gunicorn workers within the TTL, like _ing_cache does
+@functools.lru_cache(maxsize=1024)
+def compute_conversion(recipe_title, new_total_flour, include_non_percentage_groups,
+                       _time_bucket=0):
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        # One round-trip: Postgres computes the flour total and applies the
+        # ratio per row, so no classification or math happens in Python
+        prepared_execute(conn, cur, 'sel_conversion',
+                         (recipe_title, PERCENTAGE_GROUPS,
+                          include_non_percentage_groups, new_total_flour))
+        rows = cur.fetchall()
+        cur.close()
 
     if not rows:
-        return jsonify({"status": "error", "message": "找不到指定的食譜"}), 404
+        return {"status": "error", "message": "找不到指定的食譜"}, 404
+
+    original_total_flour = rows[0]['original_total_flour']
+    if original_total_flour <= 0:
+        return {"status": "error", "message": "此食譜沒有麵粉食材或麵粉重量為0"}, 400
+
+    conversion_ratio = new_total_flour / original_total_flour
 
     recipe = {
         "title": recipe_title,
@@ -272,93 +617,151 @@ def calculate_recipe_conversion():
             "steam": rows[0]['steam']
         }
     }
+    converted_ingredients = []
     for row in rows:
-        percent_display = f"{row['percent'] * 100:.2f}%" if row['percent'] is not None else ""
-        recipe['ingredients'].append({
+        if row['ing_id'] is None:
+            continue
+        ing = {
             "group": row['group_name'] or "",
             "name": row['ingredient'] or "",
-            "weight": row['weight'] or 0,
-            "percent": percent_display,
+            "weight": row['weight'],
+            "percent": row['percent_display'],
             "desc": row['description'] or ""
-        })
-
-    original_total_flour = 0
-    for ing in recipe['ingredients']:
-        if is_flour_ingredient(ing['name']) and is_percentage_group(ing['group']):
-            original_total_flour += ing['weight']
-
-    if original_total_flour <= 0:
-        return jsonify({"status": "error", "message": "此食譜沒有麵粉食材或麵粉重量為0"}), 400
-
-    conversion_ratio = new_total_flour / original_total_flour
-
-    converted_ingredients = []
-    for ing in recipe['ingredients']:
-        converted_ing = ing.copy()
-        if is_percentage_group(ing['group']) or include_non_percentage_groups:
-            converted_ing['weight'] = round(ing['weight'] * conversion_ratio, 1)
-        converted_ingredients.append(converted_ing)
+        }
+        recipe['ingredients'].append(ing)
+        converted_ingredients.append(dict(ing, weight=row['converted_weight']))
 
-    return jsonify({
+    return {
         "status": "success",
         "originalTotalFlour": original_total_flour,
         "newTotalFlour": new_total_flour,
         "conversionRatio": conversion_ratio,
         "ingredients": converted_ingredients,
         "recipe": recipe
-    })
+    }, 200
 
-def is_flour_ingredient(ingredient_name):
-    flour_keywords = ["高筋麵粉", "中筋麵粉", "低筋麵粉", "全麥麵粉", "裸麥粉", "麵粉"]
-    return any(keyword in ingredient_name for keyword in flour_keywords)
-
-def is_percentage_group(group_name):
-    percentage_groups = ["主麵團", "麵團餡料A", "麵團餡料B", "波蘭種", "液種", "中種", "魯班種"]
-    return group_name in percentage_groups
+# Documents the flour keywords behind the is_flour generated column in
+# init_db ("麵粉" subsumes the four specific flour names there)
+FLOUR_KEYWORDS = ["高筋麵粉", "中筋麵粉", "低筋麵粉", "全麥麵粉", "裸麥粉", "麵粉"]
+PERCENTAGE_GROUPS = ["主麵團", "麵團餡料A", "麵團餡料B", "波蘭種", "液種", "中種", "魯班種"]
 
 # Export to Excel
 @app.route('/api/export_excel', methods=['GET'])
 def export_excel():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM recipes")
-    data = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output)
-    worksheet = workbook.add_worksheet("食譜")
-
-    headers = ["食譜名稱", "分組", "食材", "重量 (g)", "百分比", "說明", "步驟", "建立時間", "上火溫度", "下火溫度", "烘烤時間", "旋風", "蒸汽"]
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header)
-
-    row_num = 1
-    for row in data:
-        worksheet.write(row_num, 0, row['title'])
-        worksheet.write(row_num, 1, row['group_name'])
-        worksheet.write(row_num, 2, row['ingredient'])
-        worksheet.write(row_num, 3, row['weight'])
-        worksheet.write(row_num, 4, row['percent'])
-        worksheet.write(row_num, 5, row['description'])
-        worksheet.write(row_num, 6, row['steps'])
-        worksheet.write(row_num, 7, row['timestamp'])
-        worksheet.write(row_num, 8, row['top_heat'])
-        worksheet.write(row_num, 9, row['bottom_heat'])
-        worksheet.write(row_num, 10, row['bake_time'])
-        worksheet.write(row_num, 11, '是' if row['convection'] else '否')
-        worksheet.write(row_num, 12, '是' if row['steam'] else '否')
-        row_num += 1
-
-    workbook.close()
-    output.seek(0)
-    return send_file(output, download_name="recipes.xlsx", as_attachment=True)
-
-# Serve index.html
+    # Build into a named temp file: send_file only emits ETag/Last-Modified
+    # and fulfils Range requests when given a real path, and the workbook
+    # never has to fit in RAM
+    fd, tmp_path = tempfile.mkstemp(prefix='recipes_', suffix='.xlsx')
+    os.close(fd)
+    # constant_memory flushes finished rows instead of keeping the whole
+    # workbook in RAM; the server-side cursor streams rows from Postgres.
+    # remove_timezone is required now that timestamps are TIMESTAMPTZ —
+    # xlsxwriter raises on tz-aware datetimes
+    try:
+        workbook = xlsxwriter.Workbook(tmp_path, {'constant_memory': True,
+                                                  'remove_timezone': True})
+        worksheet = workbook.add_worksheet("食譜")
+
+        headers = ["食譜名稱", "分組", "食材", "重量 (g)", "百分比", "說明", "步驟", "建立時間", "上火溫度", "下火溫度", "烘烤時間", "旋風", "蒸汽"]
+        worksheet.write_row(0, 0, headers)
+
+        with get_db_connection() as conn:
+            cur = conn.cursor(name='export_excel')
+            cur.itersize = 1000
+            cur.execute("""
+                SELECT r.title, i.group_name, i.ingredient, i.weight, i.percent, i.description,
+                       r.steps, r.timestamp, r.top_heat, r.bottom_heat, r.bake_time, r.convection, r.steam
+                FROM recipes_v2 r LEFT JOIN recipe_ingredients i ON i.recipe_id = r.id
+                ORDER BY r.timestamp DESC, i.id
+            """)
+            row_num = 1
+            for row in cur:
+                worksheet.write_row(row_num, 0, (
+                    row['title'], row['group_name'], row['ingredient'], row['weight'], row['percent'],
+                    row['description'], row['steps'], row['timestamp'], row['top_heat'],
+                    row['bottom_heat'], row['bake_time'],
+                    '是' if row['convection'] else '否', '是' if row['steam'] else '否'))
+                row_num += 1
+            cur.close()
+
+        workbook.close()
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    # send_file holds its own descriptor, so unlinking once the response
+    # is built doesn't cut the download short
+    @after_this_request
+    def _remove_export(resp):
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return resp
+
+    return send_file(
+        tmp_path, as_attachment=True, download_name="recipes.xlsx",
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        conditional=True)
+
+# Serve index.html; the page is static, so it is read and gzipped once
+# at startup instead of going through Jinja per request. The CSS/JS
+# references get a content-hash version query so the immutable static
+# cache headers are safe across deploys.
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def asset_version(filename):
+    with open(os.path.join(_BASE_DIR, 'static', filename), 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest().encode()
+
+with open(os.path.join(_BASE_DIR, 'templates', 'index.html'), 'rb') as f:
+    INDEX_HTML = f.read()
+_css_version = asset_version('app.css')
+_js_version = asset_version('app.js')
+_worker_version = asset_version('search-worker.js')
+APP_CSS_URL = '/static/app.css?v=' + _css_version.decode()
+APP_JS_URL = '/static/app.js?v=' + _js_version.decode()
+INDEX_HTML = INDEX_HTML.replace(b'__APP_CSS_V__', _css_version)
+INDEX_HTML = INDEX_HTML.replace(b'__APP_JS_V__', _js_version)
+INDEX_HTML = INDEX_HTML.replace(b'__WORKER_JS_V__', _worker_version)
+# Drop the indentation whitespace between tags (newline-separated only,
+# so meaningful same-line spaces between inline elements survive)
+INDEX_HTML = re.sub(rb'>\s*\n\s*<', b'><', INDEX_HTML)
+INDEX_HTML_GZ = gzip.compress(INDEX_HTML, 9)
+# Brotli level 11 is slow but runs once at startup; ~20% smaller than gzip
+INDEX_HTML_BR = brotli.compress(INDEX_HTML, quality=11) if brotli else None
+INDEX_ETAG = hashlib.blake2b(INDEX_HTML, digest_size=8).hexdigest()
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    if request.if_none_match.contains(INDEX_ETAG):
+        resp = Response(status=304)
+    elif INDEX_HTML_BR is not None and 'br' in accept_encoding:
+        resp = Response(INDEX_HTML_BR, mimetype='text/html')
+        resp.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accept_encoding:
+        resp = Response(INDEX_HTML_GZ, mimetype='text/html')
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = Response(INDEX_HTML, mimetype='text/html')
+    resp.set_etag(INDEX_ETAG)
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.headers['Cache-Control'] = 'public, max-age=300'
+    # Let the browser start fetching the assets while it parses the HTML
+    resp.headers.add('Link', f'<{APP_CSS_URL}>; rel=preload; as=style')
+    resp.headers.add('Link', f'<{APP_JS_URL}>; rel=preload; as=script')
+    return resp
+
+# The service worker must be served from the root so its scope covers
+# the whole app, and without long-lived caching so updates roll out
+@app.route('/sw.js')
+def service_worker():
+    return send_file(os.path.join(_BASE_DIR, 'static', 'sw.js'),
+                     mimetype='application/javascript', max_age=0)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Dev entrypoint only; production runs under gunicorn (see render.yaml).
+    # The reloader's stat() polling dominates small-request latency, so it
+    # stays off even with the debugger enabled.
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', use_reloader=False)
@@ -4,3 +4,12 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 連線池設定：pre_ping 避免使用到已被 Render 回收的連線
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '10')),
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+        'executemany_mode': 'values_plus_batch',
+    }
@@ -1,3 +1,5 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from models import db, IngredientDB
 
 def init_db(app):
@@ -22,14 +24,12 @@ def init_db(app):
                 {"name": "蜂蜜", "hydration": 17}
             ]
             
-            for ing_data in default_ingredients:
-                if not IngredientDB.query.filter_by(name=ing_data["name"]).first():
-                    ingredient = IngredientDB(
-                        name=ing_data["name"],
-                        hydration=ing_data["hydration"]
-                    )
-                    db.session.add(ingredient)
-            
+            # 一次 INSERT 完成，已存在的食材直接略過
+            db.session.execute(
+                pg_insert(IngredientDB)
+                .values(default_ingredients)
+                .on_conflict_do_nothing(index_elements=['name'])
+            )
             db.session.commit()
             print("預設食材添加成功")
             
@@ -1,5 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
 
 db = SQLAlchemy()
 
@@ -9,7 +8,8 @@ class Recipe(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False, unique=True)
     steps = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(),
+                           onupdate=db.func.now(), index=True)
     top_heat = db.Column(db.Integer, default=200)
     bottom_heat = db.Column(db.Integer, default=200)
     baking_time = db.Column(db.Integer, default=30)
@@ -23,7 +23,7 @@ class Ingredient(db.Model):
     __tablename__ = 'ingredients'
     
     id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
     group = db.Column(db.String(100), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     weight = db.Column(db.Float, default=0)
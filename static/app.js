@@ -0,0 +1,628 @@
+let currentRecipeTitleForConversion = '';
+let originalTotalFlour = 0;
+let recipes = [];
+let convertedIngredients = [];
+let ingredientsDB = [];
+let lastUsedGroup = '主麵團';
+let currentGroups = {};
+const groupOptions = ['主麵團', '麵團餡料A', '麵團餡料B', '波蘭種', '液種', '中種', '魯班種', '內餡', '裝飾'];
+const flourCheckGroups = ['主麵團', '波蘭種', '液種', '中種', '魯班種'];
+const baseIngredientOptions = ["高筋麵粉", "中筋麵粉", "低筋麵粉", "全麥麵粉", "裸麥粉", "麵粉", "水", "牛奶", "糖", "鹽", "蜂蜜", "酵母", "泡打粉", "奶油", "鮮奶油", "奶油乳酪", "奶粉", "煉乳", "雞蛋", "優格", "酒", "香草精"];
+let ingredientOptions = [...baseIngredientOptions];
+const hydrationMap = { "水": 1.0, "煉乳": 0.3, "鮮奶油": 0.5, "優格": 0.9, "奶油乳酪": 0.5, "牛奶": 0.9, "雞蛋": 0.75, "蜂蜜": 0.17 };
+
+// Collapse bursts of events (e.g. typing in a weight field) into one
+// trailing call so we do not recompute per keystroke
+function debounce(fn, delay) {
+    let timer;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), delay);
+    };
+}
+const recalcDebounced = debounce(() => {
+    calcPercentages();
+    calcHydration();
+}, 200);
+
+// Load ingredients database
+async function loadIngredientsDBForDropdown() {
+    try {
+        const response = await fetch('/api/ingredients_db');
+        ingredientsDB = await response.json();
+        // Merge baseIngredientOptions with DB ingredients, remove duplicates
+        const dbIngredients = ingredientsDB.map(i => i.name);
+        ingredientOptions = [...new Set([...baseIngredientOptions, ...dbIngredients])];
+        console.log('Ingredients DB loaded:', ingredientsDB);
+        console.log('Merged ingredientOptions:', ingredientOptions);
+    } catch (err) {
+        console.error('Failed to load ingredients DB:', err);
+        showNotification('無法載入食材資料庫', 'error');
+    }
+}
+
+function showTab(tab) {
+    document.querySelectorAll('.tab-content').forEach(s => s.classList.remove('active'));
+    document.getElementById(tab).classList.add('active');
+    if (tab === 'recipeBrowse') loadRecipes();
+    if (tab === 'stats') loadStats();
+    if (tab === 'settings') loadIngredientsDB();
+}
+
+function addIngredientRow(nameVal = "", weightVal = "", percentVal = "", descVal = "", groupVal = lastUsedGroup) {
+    const container = document.getElementById("ingredients-container");
+    if (!currentGroups[groupVal]) {
+        currentGroups[groupVal] = true;
+        const groupHeader = document.createElement("div");
+        groupHeader.className = "ingredient-group-header";
+        groupHeader.innerHTML = `<span>${groupVal} 分組</span><span class="flour-warning" id="warning-${groupVal.replace(/\s+/g, '-')}"><i class="fas fa-exclamation-circle"></i> 此分組需要至少一種麵粉食材</span>`;
+        container.appendChild(groupHeader);
+        document.getElementById(`warning-${groupVal.replace(/\s+/g, "-")}`).style.display = flourCheckGroups.includes(groupVal) ? "block" : "none";
+    }
+    const row = document.createElement("div");
+    row.className = "ingredient-grid";
+
+    // 分組下拉選單
+    const groupSelect = document.createElement("select");
+    groupSelect.innerHTML = groupOptions.map(g => `<option value="${g}" ${g === groupVal ? "selected" : ""}>${g}</option>`).join("");
+    groupSelect.addEventListener("change", function() { 
+        lastUsedGroup = this.value; 
+        updateGroupHeaders(); 
+        calcPercentages(); 
+        calcHydration(); 
+    });
+
+    // 食材名稱下拉選單
+    const nameSelect = document.createElement("select");
+    nameSelect.innerHTML = "<option value=''>選擇食材或輸入新名稱</option>" + ingredientOptions.map(o => `<option value="${o}">${o}</option>`).join("");
+    nameSelect.value = nameVal;
+    nameSelect.addEventListener("change", function() { 
+        const customInput = this.parentElement.querySelector('.ing-name-custom');
+        customInput.style.display = this.value === '' ? 'inline-block' : 'none';
+        calcPercentages(); 
+        calcHydration(); 
+    });
+
+    // 自訂食材名稱輸入框
+    const nameCustomInput = document.createElement("input");
+    nameCustomInput.type = "text";
+    nameCustomInput.className = "ing-name-custom";
+    nameCustomInput.placeholder = "新食材名稱";
+    nameCustomInput.style.display = nameVal && !ingredientOptions.includes(nameVal) ? "inline-block" : "none";
+    if (nameVal && !ingredientOptions.includes(nameVal)) nameCustomInput.value = nameVal;
+
+    // 重量輸入
+    const weightInput = document.createElement("input");
+    weightInput.type = "number"; 
+    weightInput.placeholder = "重量 (g)"; 
+    weightInput.min = "0"; 
+    weightInput.step = "1";
+    if (weightVal !== "" && weightVal !== undefined) weightInput.value = weightVal;
+    weightInput.addEventListener("input", recalcDebounced);
+
+    // 百分比輸入（唯讀）
+    const percentInput = document.createElement("input");
+    percentInput.placeholder = "百分比"; 
+    percentInput.readOnly = true;
+    if (percentVal) percentInput.value = formatPercentFrontend(percentVal);
+
+    // 說明輸入
+    const descInput = document.createElement("input");
+    descInput.placeholder = "說明 (可選)";
+    if (descVal) descInput.value = descVal;
+
+    // 刪除按鈕
+    const deleteBtn = document.createElement("button");
+    deleteBtn.innerHTML = '刪除';
+    deleteBtn.onclick = function() { 
+        row.remove(); 
+        updateGroupHeaders(); 
+        calcPercentages(); 
+        calcHydration(); 
+        showNotification('已移除食材', 'info');
+        updateConversionToolButton();
+    };
+
+    row.appendChild(groupSelect);
+    row.appendChild(nameSelect);
+    row.appendChild(nameCustomInput);
+    row.appendChild(weightInput);
+    row.appendChild(percentInput);
+    row.appendChild(descInput);
+    row.appendChild(deleteBtn);
+    container.appendChild(row);
+    calcPercentages();
+    calcHydration();
+    updateConversionToolButton();
+}
+
+function updateGroupHeaders() {
+    const container = document.getElementById("ingredients-container");
+    const existingGroups = {};
+    document.querySelectorAll(".ingredient-grid").forEach(row => {
+        const group = row.querySelector("select").value;
+        existingGroups[group] = true;
+    });
+    Object.keys(currentGroups).forEach(group => {
+        if (!existingGroups[group]) {
+            const header = document.getElementById(`warning-${group.replace(/\s+/g, '-')}`)?.parentElement;
+            if (header) header.remove();
+            delete currentGroups[group];
+        }
+    });
+    document.querySelectorAll(".ingredient-grid").forEach(row => {
+        const group = row.querySelector("select").value;
+        const hasFlour = Array.from(document.querySelectorAll(".ingredient-grid")).some(r => {
+            const g = r.querySelector("select").value;
+            const name = r.querySelector("select:nth-child(2)").value || r.querySelector(".ing-name-custom").value;
+            return g === group && isFlourIngredient(name);
+        });
+        const warning = document.getElementById(`warning-${group.replace(/\s+/g, '-')}`);
+        if (warning) warning.style.display = flourCheckGroups.includes(group) && !hasFlour ? "inline" : "none";
+    });
+}
+
+function calcPercentages() {
+    const rows = document.querySelectorAll(".ingredient-grid");
+    const groupTotals = {};
+    rows.forEach(row => {
+        const group = row.querySelector("select").value;
+        const name = row.querySelector("select:nth-child(2)").value || row.querySelector(".ing-name-custom").value;
+        const weight = parseFloat(row.querySelector("input[type=number]").value) || 0;
+        if (isFlourIngredient(name) && flourCheckGroups.includes(group)) {
+            groupTotals[group] = (groupTotals[group] || 0) + weight;
+        }
+    });
+    rows.forEach(row => {
+        const group = row.querySelector("select").value;
+        const weight = parseFloat(row.querySelector("input[type=number]").value) || 0;
+        const percentInput = row.querySelector("input[placeholder='百分比']");
+        if (flourCheckGroups.includes(group) && groupTotals[group] > 0) {
+            const percent = (weight / groupTotals[group]) * 100;
+            percentInput.value = formatPercentFrontend(percent / 100);
+        } else {
+            percentInput.value = "";
+        }
+    });
+}
+
+async function calcHydration() {
+    const rows = document.querySelectorAll(".ingredient-grid");
+    let totalHydration = 0;
+    let totalWeight = 0;
+    for (const row of rows) {
+        const name = row.querySelector("select:nth-child(2)").value || row.querySelector(".ing-name-custom").value;
+        const weight = parseFloat(row.querySelector("input[type=number]").value) || 0;
+        const ing = ingredientsDB.find(i => i.name === name);
+        let hydration = 0;
+        if (ing) {
+            hydration = ing.hydration / 100; // Use DB hydration
+        } else if (hydrationMap[name]) {
+            hydration = hydrationMap[name]; // Fallback to hydrationMap
+        }
+        if (weight > 0) {
+            totalHydration += hydration * weight;
+            totalWeight += weight;
+        }
+    }
+    const hydrationPercent = totalWeight > 0 ? (totalHydration / totalWeight) * 100 : 0;
+    document.getElementById('hydrationDisplay').textContent = `含水率: ${hydrationPercent.toFixed(2)}%`;
+}
+
+function formatPercentFrontend(percent) {
+    if (percent === "" || percent === undefined || percent === null) return "";
+    return `${(parseFloat(percent) * 100).toFixed(2)}%`;
+}
+
+function showNotification(message, type) {
+    const notification = document.getElementById('notification');
+    notification.textContent = message;
+    notification.style.background = type === 'error' ? '#dc3545' : '#17a2b8';
+    notification.style.display = 'block';
+    setTimeout(() => notification.style.display = 'none', 3000);
+}
+
+function updateConversionToolButton() {
+    const title = document.getElementById('recipeTitle').value;
+    document.getElementById('conversion-tool-btn').disabled = !title;
+}
+
+function collectIngredients() {
+    const ingredients = [];
+    document.querySelectorAll('.ingredient-grid').forEach(row => {
+        const group = row.querySelector('select').value;
+        const name = row.querySelector('select:nth-child(2)').value || row.querySelector('.ing-name-custom').value;
+        const weight = parseFloat(row.querySelector('input[type=number]').value) || 0;
+        const percent = row.querySelector("input[placeholder='百分比']").value;
+        const desc = row.querySelector("input[placeholder='說明 (可選)']").value;
+        ingredients.push({ group, name, weight, percent, desc });
+    });
+    return ingredients;
+}
+
+function saveOrUpdateRecipe() {
+    const title = document.getElementById('recipeTitle').value;
+    const ingredients = collectIngredients();
+    const steps = document.getElementById('recipeSteps').value;
+    const bakingInfo = {
+        topHeat: parseInt(document.getElementById('topHeat').value) || 200,
+        bottomHeat: parseInt(document.getElementById('bottomHeat').value) || 200,
+        time: parseInt(document.getElementById('bakeTime').value) || 30,
+        convection: document.getElementById('convection').checked,
+        steam: document.getElementById('steam').checked
+    };
+    const editMode = document.getElementById('edit-mode').value === 'true';
+    const oldTitle = document.getElementById('old-title').value;
+    const recipeId = parseInt(document.getElementById('recipe-id').value) || null;
+
+    showLoading(true);
+    const endpoint = editMode ? '/api/update_recipe' : '/api/save_recipe';
+    const body = editMode ? { recipeId, oldTitle, newTitle: title, ingredients, steps, bakingInfo } : { title, ingredients, steps, bakingInfo };
+
+    fetch(endpoint, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    }).then(res => res.json()).then(data => {
+        showLoading(false);
+        showNotification(data.message || '儲存成功', 'info');
+        clearForm();
+        loadRecipes();
+    }).catch(err => {
+        showLoading(false);
+        showNotification('錯誤: ' + err, 'error');
+    });
+}
+
+function clearForm() {
+    document.getElementById('recipeTitle').value = '';
+    document.getElementById('recipeSteps').value = '';
+    document.getElementById('topHeat').value = 200;
+    document.getElementById('bottomHeat').value = 200;
+    document.getElementById('bakeTime').value = 30;
+    document.getElementById('convection').checked = false;
+    document.getElementById('steam').checked = false;
+    document.getElementById('ingredients-container').innerHTML = '';
+    currentGroups = {};
+    lastUsedGroup = '主麵團';
+    document.getElementById('edit-mode').value = 'false';
+    document.getElementById('old-title').value = '';
+    document.getElementById('recipe-id').value = '';
+    updateConversionToolButton();
+    document.getElementById('hydrationDisplay').textContent = '含水率: 0%';
+}
+
+function loadRecipes() {
+    // Revalidate against the server's ETag; on 304 we reuse the copy in
+    // localStorage and skip downloading + parsing an unchanged payload
+    const cached = JSON.parse(localStorage.getItem('recipes_cache') || 'null');
+    const etag = localStorage.getItem('recipes_etag') || '';
+    const headers = (cached && etag) ? { 'If-None-Match': etag } : {};
+    fetch('/api/recipes', { headers }).then(async res => {
+        if (res.status === 304 && cached) {
+            recipes = cached;
+        } else {
+            recipes = await res.json();
+            try {
+                localStorage.setItem('recipes_cache', JSON.stringify(recipes));
+                localStorage.setItem('recipes_etag', res.headers.get('ETag') || '');
+            } catch (e) { /* storage full - caching is best-effort */ }
+        }
+        if (searchWorker) searchWorker.postMessage({ type: 'init', recipes });
+        populateFilter();
+        displayRecipes();
+    }).catch(err => {
+        console.error('Failed to load recipes:', err);
+        if (cached) {
+            recipes = cached;
+            populateFilter();
+            displayRecipes();
+        } else {
+            showNotification('無法載入食譜，請檢查網路連線', 'error');
+        }
+    });
+}
+
+function populateFilter() {
+    const filter = document.getElementById('recipeFilter');
+    filter.innerHTML = '<option value="all">全部食譜</option>';
+    recipes.forEach(r => {
+        const option = document.createElement('option');
+        option.value = r.title;
+        option.textContent = r.title;
+        filter.appendChild(option);
+    });
+}
+
+function displayRecipes() {
+    const filter = document.getElementById('recipeFilter').value;
+    const sort = document.getElementById('sortOrder').value;
+    let filtered = filter === 'all' ? recipes : recipes.filter(r => r.title === filter);
+    if (searchMatches) filtered = filtered.filter(r => searchMatches.has(r.title));
+
+    if (sort === 'timestamp_desc') filtered.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+    if (sort === 'timestamp_asc') filtered.sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+    if (sort === 'title_asc') filtered.sort((a, b) => a.title.localeCompare(b.title));
+    if (sort === 'title_desc') filtered.sort((a, b) => b.title.localeCompare(a.title));
+
+    // Build everything into a fragment and attach it in one operation,
+    // so the browser reflows once instead of once per card. Only the
+    // first window of cards is rendered; scrolling appends the rest.
+    currentFiltered = filtered;
+    renderLimit = RENDER_WINDOW;
+    const frag = document.createDocumentFragment();
+    filtered.slice(0, renderLimit).forEach(r => frag.appendChild(buildCard(r)));
+    const list = document.getElementById('recipeList');
+    list.replaceChildren(frag);
+    if (filtered.length > renderLimit) {
+        const sentinel = document.createElement('div');
+        sentinel.id = 'recipeListSentinel';
+        list.appendChild(sentinel);
+        listSentinelObserver.observe(sentinel);
+    }
+}
+
+// Windowed rendering: with many recipes, mounting every card makes
+// style/layout linear in recipe count even for cards never scrolled to
+const RENDER_WINDOW = 50;
+let currentFiltered = [];
+let renderLimit = RENDER_WINDOW;
+const listSentinelObserver = new IntersectionObserver(entries => {
+    if (entries.some(e => e.isIntersecting)) appendNextWindow();
+}, { rootMargin: '400px' });
+
+function appendNextWindow() {
+    const sentinel = document.getElementById('recipeListSentinel');
+    if (!sentinel) return;
+    const next = currentFiltered.slice(renderLimit, renderLimit + RENDER_WINDOW);
+    renderLimit += next.length;
+    const frag = document.createDocumentFragment();
+    next.forEach(r => frag.appendChild(buildCard(r)));
+    sentinel.parentNode.insertBefore(frag, sentinel);
+    if (renderLimit >= currentFiltered.length) {
+        listSentinelObserver.unobserve(sentinel);
+        sentinel.remove();
+    }
+}
+
+// Clone the card structure from the <template> parsed once at page load
+// instead of re-running the HTML parser per card via innerHTML
+const recipeCardTpl = document.getElementById('recipeCardTpl');
+function buildCard(r) {
+    const card = recipeCardTpl.content.firstElementChild.cloneNode(true);
+    card.querySelector('.card-title').textContent = r.title;
+    card.querySelector('.card-timestamp').textContent = `建立時間: ${r.timestamp}`;
+    card.querySelector('.card-steps').textContent = `步驟: ${r.steps}`;
+    card.querySelector('.card-baking').textContent =
+        `上火: ${r.baking.topHeat}°C, 下火: ${r.baking.bottomHeat}°C, 時間: ${r.baking.time} min, 旋風: ${r.baking.convection ? '是' : '否'}, 蒸汽: ${r.baking.steam ? '是' : '否'}`;
+    const ul = card.querySelector('.card-ingredients');
+    r.ingredients.forEach(i => {
+        const li = document.createElement('li');
+        li.textContent = `${i.group}: ${i.name} - ${i.weight}g (${i.percent}) - ${i.desc}`;
+        ul.appendChild(li);
+    });
+    card.querySelector('.card-edit').onclick = () => editRecipe(r.title);
+    card.querySelector('.card-delete').onclick = () => deleteRecipe(r.title);
+    return card;
+}
+
+// Text search runs in a Web Worker so scanning a large recipe list
+// never blocks the main thread; the server injects the worker's own
+// content hash on the script tag so the immutable static cache stays
+// correct across deploys
+let searchMatches = null; // null = no active search
+const workerVersion = ((document.querySelector('script[src*="app.js"]') || {}).dataset || {}).workerV || '';
+const searchWorker = window.Worker ? new Worker('/static/search-worker.js?v=' + workerVersion) : null;
+if (searchWorker) {
+    searchWorker.onmessage = e => {
+        searchMatches = new Set(e.data);
+        displayRecipes();
+    };
+}
+
+function runSearch(query) {
+    if (!query) {
+        searchMatches = null;
+        displayRecipes();
+    } else if (searchWorker) {
+        searchWorker.postMessage({ type: 'q', q: query });
+    }
+}
+
+document.getElementById('recipeFilter').addEventListener('change', displayRecipes);
+document.getElementById('sortOrder').addEventListener('change', displayRecipes);
+document.getElementById('recipeSearch').addEventListener('input',
+    debounce(e => runSearch(e.target.value.trim()), 200));
+
+function editRecipe(title) {
+    const recipe = recipes.find(r => r.title === title);
+    if (!recipe) return;
+
+    document.getElementById('recipeTitle').value = recipe.title;
+    document.getElementById('recipeSteps').value = recipe.steps;
+    document.getElementById('topHeat').value = recipe.baking.topHeat;
+    document.getElementById('bottomHeat').value = recipe.baking.bottomHeat;
+    document.getElementById('bakeTime').value = recipe.baking.time;
+    document.getElementById('convection').checked = recipe.baking.convection;
+    document.getElementById('steam').checked = recipe.baking.steam;
+
+    const container = document.getElementById('ingredients-container');
+    container.innerHTML = '';
+    currentGroups = {};
+    recipe.ingredients.forEach(i => {
+        addIngredientRow(i.name, i.weight, i.percent, i.desc, i.group);
+    });
+
+    document.getElementById('edit-mode').value = 'true';
+    document.getElementById('old-title').value = title;
+    document.getElementById('recipe-id').value = recipe.id || '';
+    showTab('recipeManage');
+    updateConversionToolButton();
+}
+
+function deleteRecipe(title) {
+    if (confirm(`確認刪除 ${title}?`)) {
+        fetch(`/api/delete_recipe?title=${title}`, { method: 'DELETE' }).then(res => res.json()).then(data => {
+            showNotification(data.message, 'info');
+            loadRecipes();
+        });
+    }
+}
+
+function loadStats() {
+    fetch('/api/recipes').then(res => res.json()).then(data => {
+        recipes = data;
+        const totalRecipes = recipes.length;
+        let totalIngredients = 0;
+        let totalWeight = 0;
+        recipes.forEach(r => {
+            totalIngredients += r.ingredients.length;
+            r.ingredients.forEach(i => totalWeight += i.weight);
+        });
+        const avgWeight = totalIngredients > 0 ? (totalWeight / totalIngredients).toFixed(2) : 0;
+        const latest = recipes.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))[0]?.title || '-';
+
+        document.getElementById('totalRecipes').textContent = totalRecipes;
+        document.getElementById('totalIngredients').textContent = totalIngredients;
+        document.getElementById('avgWeight').textContent = avgWeight;
+        document.getElementById('latestRecipe').textContent = latest;
+    });
+}
+
+function loadIngredientsDB() {
+    fetch('/api/ingredients_db').then(res => res.json()).then(data => {
+        ingredientsDB = data;
+        const frag = document.createDocumentFragment();
+        data.forEach(i => {
+            const item = document.createElement('div');
+            item.className = 'ing-db-item';
+            item.innerHTML = `${i.name} - ${i.hydration}% <button onclick="deleteIngredientDB('${i.name}')">刪除</button>`;
+            frag.appendChild(item);
+        });
+        document.getElementById('ingredientsDBList').replaceChildren(frag);
+        // Update ingredientOptions after loading DB
+        const dbIngredients = data.map(i => i.name);
+        ingredientOptions = [...new Set([...baseIngredientOptions, ...dbIngredients])];
+    });
+}
+
+function saveIngredientDB() {
+    const name = document.getElementById('ingName').value;
+    const hydration = parseFloat(document.getElementById('ingHydration').value);
+    if (!name) return showNotification('請輸入食材名稱', 'error');
+
+    fetch('/api/save_ingredient_db', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ name, hydration })
+    }).then(res => res.json()).then(data => {
+        showNotification(data.message, 'info');
+        loadIngredientsDB();
+    });
+}
+
+function deleteIngredientDB(name) {
+    if (confirm(`確認刪除 ${name}?`)) {
+        fetch(`/api/delete_ingredient_db?name=${name}`, { method: 'DELETE' }).then(res => res.json()).then(data => {
+            showNotification(data.message, 'info');
+            loadIngredientsDB();
+        });
+    }
+}
+
+function openConversionModal() {
+    const title = document.getElementById('recipeTitle').value;
+    if (!title) return showNotification('請先輸入食譜名稱或選擇食譜', 'error');
+
+    currentRecipeTitleForConversion = title;
+    calculateOriginalFlour();
+    document.getElementById('modal-conversion').classList.add('open');
+}
+
+function closeConversionModal() {
+    document.getElementById('modal-conversion').classList.remove('open');
+}
+
+function calculateOriginalFlour() {
+    fetch('/api/recipes').then(res => res.json()).then(data => {
+        const recipe = data.find(r => r.title === currentRecipeTitleForConversion);
+        if (!recipe) return showNotification('找不到食譜', 'error');
+
+        let totalFlour = 0;
+        recipe.ingredients.forEach(ing => {
+            if (isFlourIngredient(ing.name) && isPercentageGroup(ing.group)) {
+                totalFlour += ing.weight;
+            }
+        });
+        originalTotalFlour = totalFlour;
+        document.getElementById('original-flour').value = totalFlour;
+        setRatio(1);
+    });
+}
+
+function setRatio(ratio) {
+    const newFlour = originalTotalFlour * ratio;
+    document.getElementById('new-flour').value = newFlour;
+    document.getElementById('conversion-ratio').value = ratio.toFixed(2);
+}
+
+function calculateConversion() {
+    const newTotalFlour = parseFloat(document.getElementById('new-flour').value);
+    const includeNonPercentage = document.getElementById('include-non-percentage').checked;
+
+    fetch('/api/calculate_conversion', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            recipeTitle: currentRecipeTitleForConversion,
+            newTotalFlour,
+            includeNonPercentageGroups: includeNonPercentage
+        })
+    }).then(res => res.json()).then(data => {
+        if (data.status === 'error') return showNotification(data.message, 'error');
+
+        convertedIngredients = data.ingredients;
+        const resultDiv = document.getElementById('converted-ingredients');
+        resultDiv.innerHTML = '<ul>' + data.ingredients.map(i => `<li>${i.group}: ${i.name} - ${i.weight}g (${i.percent}) - ${i.desc}</li>`).join('') + '</ul>';
+    });
+}
+
+function copyConversionResult() {
+    const result = document.getElementById('converted-ingredients').innerText;
+    navigator.clipboard.writeText(result).then(() => showNotification('已複製', 'info'));
+}
+
+function applyToEditForm() {
+    if (convertedIngredients.length === 0) return showNotification('請先計算換算結果', 'error');
+
+    const container = document.getElementById('ingredients-container');
+    container.innerHTML = '';
+    currentGroups = {};
+    convertedIngredients.forEach(i => {
+        addIngredientRow(i.name, i.weight, i.percent, i.desc, i.group);
+    });
+
+    closeConversionModal();
+    showTab('recipeManage');
+}
+
+function isFlourIngredient(name) {
+    const keywords = ["高筋麵粉", "中筋麵粉", "低筋麵粉", "全麥麵粉", "裸麥粉", "麵粉"];
+    return keywords.some(k => name.includes(k));
+}
+
+function isPercentageGroup(group) {
+    return flourCheckGroups.includes(group) || ['麵團餡料A', '麵團餡料B'].includes(group);
+}
+
+function showLoading(show) {
+    document.getElementById('loading').style.display = show ? 'block' : 'none';
+}
+
+// Initial load
+loadIngredientsDBForDropdown();
+loadRecipes();
+showTab('recipeManage');
+
+// Cache-first app shell (served from /sw.js so its scope covers the root)
+if ('serviceWorker' in navigator) navigator.serviceWorker.register('/sw.js');
@@ -0,0 +1,29 @@
+// Filters the recipe list off the main thread: the page posts the full
+// list once after load, then one query per (debounced) keystroke, and
+// gets back the matching titles. A server-precomputed inverted index
+// (ingredient name -> recipe titles) answers exact-name queries with a
+// single lookup; anything else falls back to the substring scan.
+let recipes = [];
+let index = null;
+
+fetch('/api/search_index')
+    .then(r => r.json())
+    .then(i => { index = i; })
+    .catch(() => {});
+
+onmessage = e => {
+    if (e.data.type === 'init') {
+        recipes = e.data.recipes;
+        return;
+    }
+    const q = e.data.q.toLowerCase();
+    if (index && index[e.data.q]) {
+        postMessage(index[e.data.q]);
+        return;
+    }
+    const titles = recipes
+        .filter(r => r.title.toLowerCase().includes(q) ||
+                     r.ingredients.some(i => i.name.toLowerCase().includes(q)))
+        .map(r => r.title);
+    postMessage(titles);
+};
@@ -0,0 +1,31 @@
+// Serves the app shell cache-first with a background refresh, so repeat
+// navigations paint instantly and the app opens offline. API requests
+// are never intercepted.
+const CACHE = 'shell-v1';
+
+self.addEventListener('install', e => {
+    e.waitUntil(caches.open(CACHE).then(c => c.addAll(['/'])).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', e => {
+    e.waitUntil(caches.keys()
+        .then(keys => Promise.all(keys.filter(k => k !== CACHE).map(k => caches.delete(k))))
+        .then(() => self.clients.claim()));
+});
+
+self.addEventListener('fetch', e => {
+    const url = new URL(e.request.url);
+    if (e.request.method !== 'GET' || url.pathname.startsWith('/api/')) return;
+    e.respondWith(
+        caches.match(e.request).then(cached => {
+            const refresh = fetch(e.request).then(res => {
+                if (res.ok) {
+                    const copy = res.clone();
+                    caches.open(CACHE).then(c => c.put(e.request, copy));
+                }
+                return res;
+            }).catch(() => cached);
+            return cached || refresh;
+        })
+    );
+});